@@ -29,14 +29,23 @@
 #
 # Exposed API:
 #   validate_code(source:str, allowlist_path:str) -> List[str]  # errors only
+#   validate_code_with(source:str, allow:Allowlist) -> List[str]  # pre-loaded allowlist
+#   load_allowlist(path:str) -> Allowlist
+#   parse_source(source:str) -> ast.Module  # cached, shared tree (read-only!)
 #   rewrite_and_validate(source:str, allowlist_path:str, legacy_map_path:str|None)
 #       -> (rewritten_source:str, errors:List[str], applied_renames:List[str])
 #
 # -----------------------------------------------------------------------------
 
 from __future__ import annotations
-import ast, json, os, re
-from typing import Dict, List, Tuple, Optional, Set
+import ast, json, os, sys
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple, Optional
+
+try:
+    from orjson import loads as _json_loads  # optional; faster allowlist parsing
+except ImportError:
+    _json_loads = json.loads  # also accepts UTF-8 bytes
 
 # -----------------------------
 # Small built-in legacy helpers
@@ -59,27 +68,45 @@ _DENY_ATTR_WITH_HINT = {
     "SetYoungModulus": "Not available on ChContactMaterialNSC. Use ChContactMaterialSMC.SetYoungModulus(...) or remove for NSC.",
 }
 
+_DENY_ATTRS = frozenset(_DENY_ATTR_WITH_HINT)  # hot-path membership; hint fetched on hit only
+
 # -----------------------------
 # Helpers for reading allowlist
 # -----------------------------
 
+_NO_WINDOWS: List[Tuple[int, int]] = []  # shared, read-only
+
 class Allowlist:
     def __init__(self, data: Dict):
         self.data = data
-        self.modules: Dict[str, Set[str]] = {
-            m: set(v) for m, v in (data.get("modules") or {}).items()
+        # Interned + frozen: identifiers coming out of ast.parse are interned
+        # too, so set membership mostly resolves on pointer equality.
+        intern = sys.intern
+        self.modules: Dict[str, FrozenSet[str]] = {
+            intern(m): frozenset(map(intern, v))
+            for m, v in (data.get("modules") or {}).items()
         }
+        # Flat "module.Class" set: the hot check is one hashed lookup.
+        self._allowed_fqcns: FrozenSet[str] = frozenset(
+            intern(f"{m}.{c}") for m, cs in self.modules.items() for c in cs
+        )
         self.overloads: Dict[str, List[Dict]] = data.get("overloads") or {}
+        # fqname -> ctor windows, built once here since the allowlist is shared
+        # across requests; ctor_windows() is then a plain dict hit.
+        self._windows: Dict[str, List[Tuple[int, int]]] = {
+            intern(fq): self._build_windows(ols) for fq, ols in self.overloads.items()
+        }
 
     def is_allowed_class(self, fqname: str) -> bool:
         # fqname like "pychrono.core.ChBodyEasyCylinder"
-        mod, _, cls = fqname.rpartition(".")
-        allowed = cls and mod in self.modules and cls in self.modules[mod]
-        return bool(allowed)
+        return fqname in self._allowed_fqcns
 
     def ctor_windows(self, fqname: str) -> List[Tuple[int, int]]:
         """Return list of (min_args, max_args) windows for ctor arg-count checks."""
-        ols = self.overloads.get(fqname, [])
+        return self._windows.get(fqname, _NO_WINDOWS)
+
+    @staticmethod
+    def _build_windows(ols: List[Dict]) -> List[Tuple[int, int]]:
         wins: List[Tuple[int, int]] = []
         for o in ols:
             args = o.get("args", [])
@@ -93,23 +120,41 @@ class Allowlist:
         return wins
 
 
-def load_allowlist(path: str) -> Allowlist:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+@lru_cache(maxsize=8)
+def _load_allow_cached(path: str, mtime: float) -> Allowlist:
+    # mtime is part of the cache key only: editing allowlist.json invalidates it.
+    with open(path, "rb") as f:
+        data = _json_loads(f.read())
     return Allowlist(data)
 
 
+def load_allowlist(path: str) -> Allowlist:
+    """Parsed allowlist, shared across calls until the file changes on disk."""
+    return _load_allow_cached(path, os.path.getmtime(path))
+
+
+@lru_cache(maxsize=8)
+def _load_legacy_cached(path: str, mtime: float) -> Tuple[Dict[str, str], Dict[str, str]]:
+    # Same (path, mtime) keying as the allowlist; callers must not mutate.
+    try:
+        with open(path, "rb") as f:
+            m = _json_loads(f.read())
+        return m.get("classes", {}), m.get("attributes", {})
+    except Exception:
+        return {}, {}
+
+
 def load_legacy_map(path: Optional[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
     classes = dict(_BUILTIN_CLASS_RENAMES)
     attrs = dict(_BUILTIN_ATTR_RENAMES)
-    if path and os.path.exists(path):
+    if path:
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                m = json.load(f)
-            classes.update(m.get("classes", {}))
-            attrs.update(m.get("attributes", {}))
-        except Exception:
-            pass
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return classes, attrs
+        file_classes, file_attrs = _load_legacy_cached(path, mtime)
+        classes.update(file_classes)
+        attrs.update(file_attrs)
     return classes, attrs
 
 # -----------------------------
@@ -125,48 +170,77 @@ def _attr_chain(root: ast.AST) -> List[str]:
     Turn a.Attribute.Attribute into ["a", "Attribute", "Attribute"].
     If not resolvable, return [].
     """
-    out: List[str] = []
+    # Pass 1: measure depth and find the base; pass 2: fill a presized list
+    # from the tail (no append/reverse).
+    depth = 0
     cur = root
     while isinstance(cur, ast.Attribute):
-        out.append(cur.attr)
+        depth += 1
         cur = cur.value
-    if isinstance(cur, ast.Name):
-        out.append(cur.id)
-        out.reverse()
-        return out
-    return []
-
-def _guess_module_from_alias(alias_target: str, alias_map: Dict[str, str]) -> Optional[str]:
-    """
-    Given the first identifier in a chain, see which pychrono module it belongs to.
-    alias_map: {'chrono':'pychrono.core', 'veh':'pychrono.vehicle', ...}
-    """
-    return alias_map.get(alias_target)
+    if not isinstance(cur, ast.Name):
+        return []
+    out: List[str] = [cur.id] * (depth + 1)
+    cur = root
+    while depth:
+        out[depth] = cur.attr
+        depth -= 1
+        cur = cur.value
+    return out
 
-def _fqname_from_chain(chain: List[str], alias_map: Dict[str, str]) -> Optional[str]:
-    """
-    Convert something like ["chrono","ChBodyEasyCylinder"] to "pychrono.core.ChBodyEasyCylinder",
-    or ["veh","M113"] -> "pychrono.vehicle.M113".
-    """
-    if not chain:
-        return None
-    base = chain[0]
-    mod = _guess_module_from_alias(base, alias_map)
-    if not mod:
-        return None
-    if len(chain) == 1:
-        return mod
-    return mod + "." + ".".join(chain[1:])
+def _chain_root(node: ast.AST) -> Optional[str]:
+    """Root identifier of an attribute chain (a.b.c -> 'a'), without building the chain."""
+    while isinstance(node, ast.Attribute):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
 
 # -----------------------------
 # Rewriter (legacy → current)
 # -----------------------------
 
+# An edit is (lineno, start_byte, end_byte, old_text, new_text); columns are
+# UTF-8 byte offsets, exactly as ast reports them.
+_Edit = Tuple[int, int, int, str, str]
+
+def _apply_edits(source: str, edits: List[_Edit]) -> Optional[str]:
+    """
+    Splice identifier renames into the original source at their AST positions,
+    leaving all other formatting untouched. Returns None if any position does
+    not line up with the expected old text (caller falls back to unparse).
+    """
+    data = source.encode("utf-8")
+    starts = [0]
+    i = data.find(b"\n")
+    while i != -1:
+        starts.append(i + 1)
+        i = data.find(b"\n", i + 1)
+
+    out: List[bytes] = []
+    tail = len(data)
+    for lineno, start, end, old, new in sorted(edits, reverse=True):
+        if lineno > len(starts):
+            return None
+        lo, hi = starts[lineno - 1] + start, starts[lineno - 1] + end
+        if hi > tail or data[lo:hi] != old.encode("utf-8"):
+            return None
+        out.append(data[hi:tail])
+        out.append(new.encode("utf-8"))
+        tail = lo
+    out.append(data[:tail])
+    out.reverse()
+    return b"".join(out).decode("utf-8")
+
 class LegacyRewriter(ast.NodeTransformer):
     def __init__(self, class_renames: Dict[str, str], attr_renames: Dict[str, str]):
         self.class_renames = class_renames
         self.attr_renames = attr_renames
         self.applied: List[str] = []
+        self.edits: List[_Edit] = []
+        # With an empty map the matching visit_* is pure overhead on every
+        # Name/Attribute node: shadow it with the plain traversal.
+        if not class_renames:
+            self.visit_Name = self.generic_visit
+        if not attr_renames:
+            self.visit_Attribute = self.generic_visit
 
     def visit_Attribute(self, node: ast.Attribute) -> ast.AST:
         self.generic_visit(node)
@@ -175,6 +249,10 @@ class LegacyRewriter(ast.NodeTransformer):
             new = self.attr_renames[node.attr]
             if new != node.attr:
                 self.applied.append(f"attribute: {node.attr} -> {new}")
+                # The attribute name is always the last token of the node
+                end = node.end_col_offset
+                start = end - len(node.attr.encode("utf-8"))
+                self.edits.append((node.end_lineno, start, end, node.attr, new))
                 node.attr = new
         return node
 
@@ -184,6 +262,7 @@ class LegacyRewriter(ast.NodeTransformer):
             new = self.class_renames[node.id]
             if new != node.id:
                 self.applied.append(f"class: {node.id} -> {new}")
+                self.edits.append((node.lineno, node.col_offset, node.end_col_offset, node.id, new))
                 node.id = new
         return node
 
@@ -191,48 +270,138 @@ class LegacyRewriter(ast.NodeTransformer):
 # Validator (constructors + deny attrs)
 # -----------------------------
 
-class PyChronoValidator(ast.NodeVisitor):
+# Nodes whose subtree can never contain an ast.Call (the only type in
+# PyChronoValidator._DISPATCH): the walk never pushes them. Note that f-strings,
+# argument defaults and keyword values CAN hold calls, so they are not here.
+_SKIP_TYPES = frozenset({
+    ast.Load, ast.Store, ast.Del,
+    ast.Constant, ast.Name, ast.alias,
+    ast.Pass, ast.Break, ast.Continue, ast.Global, ast.Nonlocal,
+    ast.Import, ast.ImportFrom,
+    *ast.operator.__subclasses__(), *ast.boolop.__subclasses__(),
+    *ast.cmpop.__subclasses__(), *ast.unaryop.__subclasses__(),
+})
+
+class PyChronoValidator:
+    """
+    Single iterative pre-order pass over the tree. Only node types present in
+    _DISPATCH are inspected; everything else is just traversed, so there is no
+    per-node getattr('visit_' + name) lookup as with ast.NodeVisitor.
+    """
+
     def __init__(self, allow: Allowlist, alias_map: Dict[str, str]):
         self.allow = allow
         self.alias_map = alias_map
         self.errors: List[str] = []
 
-    def visit_Call(self, node: ast.Call):
+    def visit(self, tree: ast.AST) -> None:
+        dispatch = self._DISPATCH
+        skip = _SKIP_TYPES
+        AST, Attribute = ast.AST, ast.Attribute
+        stack = [tree]
+        pop, push = stack.pop, stack.append
+        while stack:
+            node = pop()
+            fn = dispatch.get(type(node))
+            if fn is not None:
+                fn(self, node)
+            # Descend through _fields directly (no iter_child_nodes generator),
+            # pushing in reverse so the leftmost child is popped first. An
+            # attribute chain a.b.c only matters through its base (f().b.c),
+            # so it is collapsed to that base here and never walked link by link.
+            for name in reversed(node._fields):
+                value = getattr(node, name, None)
+                if type(value) is list:
+                    for item in reversed(value):
+                        while type(item) is Attribute:
+                            item = item.value
+                        if isinstance(item, AST) and type(item) not in skip:
+                            push(item)
+                else:
+                    while type(value) is Attribute:
+                        value = value.value
+                    if isinstance(value, AST) and type(value) not in skip:
+                        push(value)
+
+    def _on_call(self, node: ast.Call) -> None:
+        errors = self.errors
+        func = node.func
+        if not isinstance(func, ast.Attribute):
+            return
+
         # (1) Attribute denylist by name (no deep type info; conservative)
-        if isinstance(node.func, ast.Attribute):
-            if node.func.attr in _DENY_ATTR_WITH_HINT:
-                self.errors.append(
-                    f"Use of removed/denied attribute '{node.func.attr}'. Hint: {_DENY_ATTR_WITH_HINT[node.func.attr]}"
-                )
+        attr = func.attr
+        if attr in _DENY_ATTRS:
+            errors.append(
+                f"Use of removed/denied attribute '{attr}'. Hint: {_DENY_ATTR_WITH_HINT[attr]}"
+            )
 
         # (2) Constructor checks only for pychrono.* classes in allowlist
-        # Attempt to recover a fully-qualified name from alias + attribute chain
-        chain = _attr_chain(node.func) if isinstance(node.func, ast.Attribute) else []
-        if chain:
-            fq = _fqname_from_chain(chain, self.alias_map)
-
-            # If it looks like a class ctor (module + ClassName), validate
-            if fq and fq.count(".") >= 2:
-                if not self.allow.is_allowed_class(fq):
-                    self.errors.append(f"Constructor not allowed: '{fq}'. Not in allowlist.")
-                else:
-                    # If overloads exist, validate arg-count window
-                    wins = self.allow.ctor_windows(fq)
-                    if wins:
-                        argc = len(node.args) + sum(1 for k in node.keywords if k.arg is not None)
-                        ok = any(lo <= argc <= hi for (lo, hi) in wins)
-                        if not ok:
-                            self.errors.append(
-                                f"Constructor mismatch for {fq} with {argc} args. "
-                                f"Allowed arg windows: {wins}"
-                            )
+        # Resolve alias -> module first; this also filters out math.sin(x),
+        # lst.append(y), ... before any string is built.
+        mod = self.alias_map.get(_chain_root(func))
+        if mod is None:
+            return
+        # Recover the fully-qualified name; chrono.ChBody(...) is by far the
+        # common shape and needs a single concat.
+        if isinstance(func.value, ast.Name):
+            fq = mod + "." + func.attr
+        else:
+            fq = mod + "." + ".".join(_attr_chain(func)[1:])
+
+        # Alias targets are always pychrono.<sub>, so fq is module + ClassName
+        allow = self.allow
+        if not allow.is_allowed_class(fq):
+            errors.append(f"Constructor not allowed: '{fq}'. Not in allowlist.")
+            return
+        # If overloads exist, validate arg-count window
+        wins = allow.ctor_windows(fq)
+        if wins:
+            argc = len(node.args) + sum(1 for k in node.keywords if k.arg is not None)
+            ok = any(lo <= argc <= hi for (lo, hi) in wins)
+            if not ok:
+                errors.append(
+                    f"Constructor mismatch for {fq} with {argc} args. "
+                    f"Allowed arg windows: {wins}"
+                )
 
-        self.generic_visit(node)
+    _DISPATCH = {ast.Call: _on_call}
 
 # -----------------------------
 # Public API
 # -----------------------------
 
+def _parse(source: str) -> ast.Module:
+    # AST only, and no __future__ flags leaking in from this module.
+    return compile(source, "<gate>", "exec", ast.PyCF_ONLY_AST, dont_inherit=True)
+
+# A tree costs ~150x its source in memory, so only a few small ones are kept:
+# the cache only has to bridge validate -> compile of the same request (the
+# server caches validation results itself). Bigger sources are re-parsed.
+_PARSE_CACHE_MAX_CHARS = 64 * 1024
+
+@lru_cache(maxsize=4)
+def _parse_small_cached(source: str) -> ast.Module:
+    return _parse(source)
+
+def _parse_cached(source: str) -> ast.Module:
+    """
+    Parse once per distinct (small) source: validation followed by compile of
+    the same script reuses the tree. The result is shared, so it must be
+    treated as read-only; SyntaxError is not cached and re-raises.
+    """
+    if len(source) > _PARSE_CACHE_MAX_CHARS:
+        return _parse(source)
+    return _parse_small_cached(source)
+
+
+def parse_source(source: str) -> ast.Module:
+    """
+    The same cached tree validate_code parsed, e.g. to compile() it afterwards
+    without a second parse. Shared between callers: do not mutate it.
+    """
+    return _parse_cached(source)
+
 def _collect_aliases(tree: ast.AST) -> Dict[str, str]:
     """
     Map local aliases to exact pychrono modules:
@@ -271,7 +440,8 @@ def _collect_aliases(tree: ast.AST) -> Dict[str, str]:
         # Many examples use 'import pychrono as chrono'
         # Make a soft assumption that 'chrono' means core when used.
         alias_map["chrono"] = "pychrono.core"
-    return alias_map
+    intern = sys.intern
+    return {intern(k): intern(v) for k, v in alias_map.items()}
 
 
 def rewrite_and_validate(
@@ -284,50 +454,63 @@ def rewrite_and_validate(
     (2) Validate ctor usage and denylisted attributes.
     Returns: (rewritten_source, errors, applied_renames)
     """
-    allow = load_allowlist(allowlist_path)
     cls_ren, attr_ren = load_legacy_map(legacy_map_path)
+    return _rewrite_and_validate(source, load_allowlist(allowlist_path), cls_ren, attr_ren)
 
-    # Parse
+
+def _rewrite_and_validate(
+    source: str,
+    allow: Allowlist,
+    cls_ren: Dict[str, str],
+    attr_ren: Dict[str, str],
+) -> Tuple[str, List[str], List[str]]:
+    # Parse (the shared cached tree is only safe when nothing will mutate it)
     try:
-        tree = ast.parse(source)
+        tree = _parse(source) if (cls_ren or attr_ren) else _parse_cached(source)
     except SyntaxError as e:
         return source, [f"SyntaxError: {e.msg} at line {e.lineno}"], []
 
-    # Rewriting pass
-    rewriter = LegacyRewriter(cls_ren, attr_ren)
-    new_tree = rewriter.visit(tree)
-    ast.fix_missing_locations(new_tree)
+    # Rewriting pass (renames are applied in place on the parsed tree);
+    # skipped outright when no renames are configured (the common case).
+    applied: List[str] = []
     rewritten = source
-    if rewriter.applied:
-        try:
-            import astor  # optional; nicer roundtrip if present
-            rewritten = astor.to_source(new_tree)
-        except Exception:
-            # Fallback: use built-in unparse (Py3.9+)
-            try:
-                rewritten = ast.unparse(new_tree)  # type: ignore[attr-defined]
-            except Exception:
-                # Last resort: do name-based text replacements (best-effort)
-                rewritten = source
-                for old, new in cls_ren.items():
-                    rewritten = re.sub(rf"\b{re.escape(old)}\b", new, rewritten)
-                for old, new in attr_ren.items():
-                    rewritten = re.sub(rf"\.{re.escape(old)}\b", f".{new}", rewritten)
+    if cls_ren or attr_ren:
+        rewriter = LegacyRewriter(cls_ren, attr_ren)
+        tree = rewriter.visit(tree)
+        applied = rewriter.applied
+        if rewriter.edits:
+            # Positional splice of the renamed identifiers; validation below
+            # runs on the already-rewritten tree, so there is no reparse.
+            spliced = _apply_edits(source, rewriter.edits)
+            rewritten = spliced if spliced is not None else ast.unparse(tree)
+
+    # Fast bypass: any pychrono use needs the text "chrono" (import or the
+    # default alias), and denied attributes can only hit if their name occurs.
+    # Otherwise the walk below cannot report anything; the parse above already
+    # covered syntax errors. ASCII only: the parser NFKC-normalizes
+    # identifiers, so e.g. a fullwidth "ｃhrono" never matches the text test.
+    if (
+        rewritten.isascii()
+        and "chrono" not in rewritten
+        and not any(a in rewritten for a in _DENY_ATTRS)
+    ):
+        return rewritten, [], applied
 
     # Validation pass
-    try:
-        tree2 = ast.parse(rewritten)
-    except SyntaxError as e:
-        return rewritten, [f"SyntaxError after rewrite: {e.msg} at line {e.lineno}"], rewriter.applied
-
-    alias_map = _collect_aliases(tree2)
+    alias_map = _collect_aliases(tree)
     validator = PyChronoValidator(allow, alias_map)
-    validator.visit(tree2)
+    validator.visit(tree)
 
-    return rewritten, validator.errors, rewriter.applied
+    return rewritten, validator.errors, applied
 
 
 def validate_code(source: str, allowlist_path: str) -> List[str]:
     """For servers that only want errors (no rewrite)."""
-    _rew, errs, _applied = rewrite_and_validate(source, allowlist_path, None)
+    return validate_code_with(source, load_allowlist(allowlist_path))
+
+
+def validate_code_with(source: str, allow: Allowlist) -> List[str]:
+    """validate_code against an Allowlist the caller already holds (no stat/open per call)."""
+    cls_ren, attr_ren = load_legacy_map(None)
+    _rew, errs, _applied = _rewrite_and_validate(source, allow, cls_ren, attr_ren)
     return errs
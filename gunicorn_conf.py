@@ -0,0 +1,37 @@
+# gunicorn_conf.py
+# ---------------------------------------------------------------------------
+# Production launch config for server.py.
+#
+# Start command: gunicorn -c gunicorn_conf.py server:app
+#
+# Each worker is a separate process with its own event loop, validator
+# threads, warm runner pool and allowlist: all of that is created by the app's
+# startup hooks, which run in the worker after the fork (preload_app stays
+# off), so nothing is shared across workers. EXEC_CONCURRENCY and
+# EXEC_POOL_SIZE are therefore per worker.
+#
+# Environment:
+#   PORT            : listen port (default "10000", Render's default)
+#   WEB_CONCURRENCY : worker processes (default min(4, CPU count))
+# ---------------------------------------------------------------------------
+
+import os
+
+from uvicorn.workers import UvicornWorker
+
+
+class UvloopWorker(UvicornWorker):
+    # Named explicitly instead of uvicorn's "auto", so a missing uvloop or
+    # httptools fails at boot rather than silently using the slower fallbacks.
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", str(min(4, os.cpu_count() or 1))))
+worker_class = "gunicorn_conf.UvloopWorker"
+preload_app = False
+# Longer than EXEC_TIMEOUT_SEC, so a worker waiting on a slow script is not
+# mistaken for a hung one.
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
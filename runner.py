@@ -0,0 +1,109 @@
+# runner.py
+# ---------------------------------------------------------------------------
+# Warm worker for /execute.
+#
+# server.py starts these ahead of time. Each one imports the heavy modules
+# (EXEC_PRELOAD, e.g. pychrono) up front and then blocks on stdin; when a job
+# arrives it runs exactly ONE user script and exits. User code therefore never
+# shares a process with another request -- only interpreter startup and the
+# preload are paid before the request instead of during it.
+#
+# Usage : python -I -u runner.py [module,module,...] [cpu=S,as=BYTES,fsize=BYTES]
+# Limits: kernel rlimits applied after the preload, so server.py keeps its
+#         vfork spawn path (no preexec_fn). cpu is a budget on top of the CPU
+#         the preload already used; 0 or absent means unlimited.
+# Job   : marshal.dumps((source, code_or_None)) on stdin, terminated by EOF.
+#         The server compiles the AST it already parsed for validation, so the
+#         worker normally skips tokenize/parse/compile; None means "compile the
+#         source here" (used when only compile() can report the error).
+# Result: the script's own stdout/stderr and exit status, as with "python -".
+# ---------------------------------------------------------------------------
+
+import importlib.machinery
+import linecache
+import marshal
+import math
+import resource
+import sys
+import traceback
+import types
+
+FILENAME = "<stdin>"
+
+
+def _preload(names: str) -> None:
+    for name in filter(None, names.split(",")):
+        try:
+            __import__(name)
+        except Exception:
+            pass  # not installed here: the user script will see the real error
+
+
+def _lower_limit(res: int, soft: int, hard: int) -> None:
+    # An unprivileged process may only lower its hard limit, never raise it.
+    _, cur_hard = resource.getrlimit(res)
+    if cur_hard != resource.RLIM_INFINITY:
+        hard = min(hard, cur_hard)
+        soft = min(soft, hard)
+    resource.setrlimit(res, (soft, hard))
+
+
+def _apply_limits(spec: str) -> None:
+    for item in filter(None, spec.split(",")):
+        key, _, value = item.partition("=")
+        n = int(value)
+        if n <= 0:
+            continue
+        if key == "cpu":
+            # SIGXCPU at the soft limit, SIGKILL a second later if ignored.
+            ru = resource.getrusage(resource.RUSAGE_SELF)
+            n += math.ceil(ru.ru_utime + ru.ru_stime)
+            _lower_limit(resource.RLIMIT_CPU, n, n + 1)
+        elif key == "as":
+            _lower_limit(resource.RLIMIT_AS, n, n)
+        elif key == "fsize":
+            # Python ignores SIGXFSZ, so oversized writes raise OSError instead.
+            _lower_limit(resource.RLIMIT_FSIZE, n, n)
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        _preload(sys.argv[1])
+    if len(sys.argv) > 2:
+        _apply_limits(sys.argv[2])
+
+    source, code = marshal.loads(sys.stdin.buffer.read())
+
+    # Fresh __main__ so the script sees the same globals as "python -" would.
+    main_mod = types.ModuleType("__main__")
+    main_mod.__builtins__ = __builtins__
+    # Same as "python -": __file__ is "<stdin>" (scripts resolving data paths via
+    # os.path.dirname(__file__) get "" -> the cwd), __spec__ stays None.
+    main_mod.__file__ = FILENAME
+    main_mod.__loader__ = importlib.machinery.BuiltinImporter
+    sys.modules["__main__"] = main_mod
+    sys.argv = ["-"]
+    # Lets tracebacks show the offending source lines.
+    linecache.cache[FILENAME] = (len(source), None, source.splitlines(True), FILENAME)
+
+    try:
+        if code is None:
+            code = compile(source, FILENAME, "exec", dont_inherit=True)
+        exec(code, main_mod.__dict__)
+    except SystemExit:
+        raise
+    except BaseException as e:
+        if isinstance(e, SyntaxError) and e.text is None and e.filename == FILENAME and e.lineno:
+            # compile() from a string leaves text unset; fill it in so the
+            # report shows the line and caret, as running a script file does.
+            lines = source.splitlines(True)
+            if e.lineno <= len(lines):
+                e.text = lines[e.lineno - 1]
+        # Drop this runner's own frame so the traceback starts in user code.
+        tb = e.__traceback__.tb_next if e.__traceback__ is not None else None
+        traceback.print_exception(type(e), e, tb)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,46 +2,127 @@
 # ---------------------------------------------------------------------------
 # Chrono 9.0.1 Gate: Rewrite + Validate + Execute microservice
 #
-# - Auth: "Authorization: Bearer <AUTH_KEY>" header (preferred), or JSON auth_key.
+# - Auth: "Authorization: Bearer <AUTH_KEY>" header (preferred; checked before the
+#   body is read), or JSON auth_key (checked after decoding; /rewrite: header only).
 # - Endpoints:
 #     GET  /            -> { ok: true, name: "...", ts: <unix> }    (root for default health probes)
-#     GET  /health      -> { ok: true, ts: <unix> }                  (explicit health)
+#     GET  /health      -> { ok: true, ts: <unix>, exec_inflight: n } (explicit health + load signal)
 #     GET  /healthz     -> { ok: true }                              (alt path for some platforms)
 #     GET  /version     -> { ok: true, version: "...", allowlist_loaded: bool }
 #     POST /rewrite     -> { ok, errors, rewritten, replacements }
-#     POST /validate    -> { ok, errors }
-#     POST /execute     -> { ok, returncode, stdout, stderr }  (re-validates first)
+#     POST /validate    -> { ok, errors, token? }  (token only when ok; see VALIDATION_TOKEN_TTL_SEC)
+#     POST /validate_batch -> { ok, results: [{ ok, errors }, ...] }  (body: { items: [{ code }, ...] })
+#     POST /execute     -> { ok, returncode, stdout, stderr, truncated }  (re-validates first,
+#                          unless the body carries a fresh /validate token for the same code)
+#     POST /execute_stream -> NDJSON, one object per line, as the script runs:
+#                          { stream: "stdout"|"stderr", data } ... then a final
+#                          { event: "exit", ok, returncode, truncated } or { event: "timeout", ok: false, detail }
 #
 # Notes:
 # - Only enforces class/attr rules defined in allowlist.json (legacy imports are ignored).
 # - Legacy → current renames happen in /rewrite (conservative text-level).
 # - This file does NOT import pychrono. Validation is static (AST-based).
-# - Make sure your Render start command uses: gunicorn -k uvicorn.workers.UvicornWorker server:app
+# - /execute runs each script in its own pre-started runner.py process (warm pool).
+# - Make sure your Render start command uses: gunicorn -c gunicorn_conf.py server:app
+#   (multi-worker, uvloop + httptools; see gunicorn_conf.py)
 #
 # Environment:
 #   AUTH_KEY         : required secret for bearer auth
-#   ALLOWLIST_PATH   : optional; default "allowlist.json"
+#   ALLOWLIST_PATH   : optional; default "allowlist.json" (loaded once at startup)
+#   ALLOWLIST_RELOAD_SEC : optional; how often to check the allowlist mtime and hot-reload (default "5"; 0 disables)
 #   EXEC_TIMEOUT_SEC : optional; default "15"
+#   MAX_CODE_BYTES   : optional; max request body size in bytes (default 200 KiB), else 413
+#   VALIDATE_CONCURRENCY : optional; max validations running in worker threads (default: CPU count)
+#   VALIDATION_CACHE_SIZE : optional; remembered validation results (default "1024"; 0 disables)
+#   MAX_BATCH_ITEMS  : optional; max snippets per /validate_batch request (default "32"), else 422
+#   VALIDATION_TOKEN_TTL_SEC : optional; how long a /validate token lets /execute skip validation (default "60")
+#   VALIDATION_TOKEN_SECRET  : optional; token signing key shared by all workers (default: random per
+#                      process, so a token only skips validation on the worker that issued it)
+#   REQUIRE_REVALIDATE : optional; "1" ignores tokens and always re-validates in /execute
+#   EXEC_MAX_OUTPUT_BYTES : optional; default cap on captured stdout and on stderr, each (1 MiB)
+#   MAX_STDOUT_BYTES / MAX_STDERR_BYTES : optional; per-stream caps (default EXEC_MAX_OUTPUT_BYTES);
+#                      a script writing past either is killed and the response has truncated: true
+#   EXEC_CONCURRENCY : optional; max /execute subprocesses at once (default "4"); beyond that
+#                      a request waits up to EXEC_QUEUE_WAIT_SEC (default "0.5") then gets 503
+#   EXEC_POOL_SIZE   : optional; warm single-use runner.py workers kept idle (default "2"; 0 disables)
+#   EXEC_PRELOAD     : optional; comma-separated modules idle workers import up front (default "pychrono")
+#   EXEC_CPU_SEC     : optional; RLIMIT_CPU budget per script in CPU seconds (default "0" = off). Counts
+#                      all threads, so size it for multi-threaded (OpenMP) sims; a script over it dies
+#                      with returncode -24 (SIGXCPU)
+#   EXEC_MAX_MEMORY_MB / EXEC_MAX_FILE_MB : optional; RLIMIT_AS / RLIMIT_FSIZE per script (default "0" = off)
 # ---------------------------------------------------------------------------
 
+import asyncio
+import codecs
+import hashlib
+import hmac
+import marshal
 import os
+import re
 import time
 import tempfile
-import subprocess
 import sys
-from typing import Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException, Header
-from pydantic import BaseModel
+import msgspec
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Header, Request
+from fastapi.responses import ORJSONResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
 
-from allowlist_enforcer import validate_code  # signature: validate_code(code: str, allowlist_path: str)
+from allowlist_enforcer import Allowlist, load_allowlist, parse_source, validate_code, validate_code_with
 
 APP_VERSION = "v3.0"
 AUTH_KEY = os.environ.get("AUTH_KEY", "")
+_AUTH_KEY_BYTES = AUTH_KEY.encode("utf-8")  # encoded once; compared in constant time
 ALLOWLIST_PATH = os.environ.get("ALLOWLIST_PATH", "allowlist.json")
+ALLOWLIST_RELOAD_SEC = float(os.environ.get("ALLOWLIST_RELOAD_SEC", "5"))
 EXEC_TIMEOUT = float(os.environ.get("EXEC_TIMEOUT_SEC", "15"))
+MAX_CODE_BYTES = int(os.environ.get("MAX_CODE_BYTES", str(200 * 1024)))
+VALIDATE_CONCURRENCY = int(os.environ.get("VALIDATE_CONCURRENCY", str(os.cpu_count() or 1)))
+VALIDATION_CACHE_SIZE = int(os.environ.get("VALIDATION_CACHE_SIZE", "1024"))
+MAX_BATCH_ITEMS = int(os.environ.get("MAX_BATCH_ITEMS", "32"))
+VALIDATION_TOKEN_TTL = float(os.environ.get("VALIDATION_TOKEN_TTL_SEC", "60"))
+REQUIRE_REVALIDATE = os.environ.get("REQUIRE_REVALIDATE", "0") == "1"
+# Never AUTH_KEY: every client holds that, and could then sign unvalidated code.
+_VALIDATION_TOKEN_KEY = os.environ.get("VALIDATION_TOKEN_SECRET", "").encode("utf-8") or os.urandom(32)
+EXEC_MAX_OUTPUT_BYTES = int(os.environ.get("EXEC_MAX_OUTPUT_BYTES", str(1 << 20)))
+MAX_STDOUT_BYTES = int(os.environ.get("MAX_STDOUT_BYTES", str(EXEC_MAX_OUTPUT_BYTES)))
+MAX_STDERR_BYTES = int(os.environ.get("MAX_STDERR_BYTES", str(EXEC_MAX_OUTPUT_BYTES)))
+EXEC_CONCURRENCY = int(os.environ.get("EXEC_CONCURRENCY", "4"))
+EXEC_QUEUE_WAIT = float(os.environ.get("EXEC_QUEUE_WAIT_SEC", "0.5"))
+EXEC_POOL_SIZE = int(os.environ.get("EXEC_POOL_SIZE", "2"))
+EXEC_PRELOAD = os.environ.get("EXEC_PRELOAD", "pychrono")
+EXEC_CPU_SEC = int(os.environ.get("EXEC_CPU_SEC", "0"))
+EXEC_MAX_MEMORY_MB = int(os.environ.get("EXEC_MAX_MEMORY_MB", "0"))
+EXEC_MAX_FILE_MB = int(os.environ.get("EXEC_MAX_FILE_MB", "0"))
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "runner.py")
+SCRIPT_FILENAME = "<stdin>"  # must match runner.FILENAME (its linecache key for tracebacks)
+# Looked up once. Deliberately not realpath()'d: a venv's python is a symlink
+# and only finds the venv's site-packages when started through it.
+PYTHON_BIN = os.path.abspath(sys.executable)
+# rlimits are applied by runner.py itself (see there), not via preexec_fn.
+_RUNNER_LIMITS = f"cpu={EXEC_CPU_SEC},as={EXEC_MAX_MEMORY_MB << 20},fsize={EXEC_MAX_FILE_MB << 20}"
+# -I keeps the child isolated from PYTHON* env vars and user site-packages.
+_RUNNER_ARGV = (PYTHON_BIN, "-I", "-u", RUNNER_PATH, EXEC_PRELOAD, _RUNNER_LIMITS)
+# User scripts must never see the server's secrets: with the token key a script
+# could sign its own "already validated" token for arbitrary code.
+_RUNNER_ENV = {k: v for k, v in os.environ.items() if k not in ("AUTH_KEY", "VALIDATION_TOKEN_SECRET")}
 
-app = FastAPI(title="Chrono 9.0.1 Code Gate")
+# orjson for every response: /execute can carry hundreds of KB of stdout/stderr.
+app = FastAPI(title="Chrono 9.0.1 Code Gate", default_response_class=ORJSONResponse)
+
+@app.exception_handler(StarletteHTTPException)
+async def _http_error(request: Request, exc: StarletteHTTPException):
+    # Same {"detail": ...} shape as FastAPI's default handler, via orjson.
+    return ORJSONResponse(
+        {"detail": exc.detail}, status_code=exc.status_code, headers=getattr(exc, "headers", None)
+    )
 
 # -------------------- Legacy→Current map (extend as needed) --------------------
 LEGACY_TO_CURRENT = {
@@ -51,108 +132,582 @@ LEGACY_TO_CURRENT = {
 }
 
 # -------------------- Models --------------------
-class CodeReq(BaseModel):
+# msgspec structs decoded straight from the raw body: one C-level pass, no
+# pydantic model construction for a payload that is mostly one big string.
+class CodeReq(msgspec.Struct):
     code: str
     auth_key: Optional[str] = None  # fallback if no Authorization header
 
-class RewriteReq(BaseModel):
+class ExecReq(CodeReq):
+    token: Optional[str] = None  # from a successful /validate of the same code
+
+class RewriteReq(msgspec.Struct):
     code: str
 
+class BatchItem(msgspec.Struct):
+    code: str
+
+class BatchReq(msgspec.Struct):
+    items: List[BatchItem]
+    auth_key: Optional[str] = None
+
+async def _decode_body(request: Request, model: type):
+    # Oversized bodies never get here: BodyLimitMiddleware refuses them first.
+    body = await request.body()
+    try:
+        return msgspec.json.decode(body, type=model)
+    except msgspec.DecodeError as e:  # also covers msgspec.ValidationError
+        raise HTTPException(status_code=422, detail=str(e))
+
+class BodyLimitMiddleware:
+    """
+    Pure ASGI guard that refuses bodies over max_bytes before they are buffered.
+    A declared Content-Length is checked up front, without reading anything;
+    chunked or undeclared bodies are counted as they stream in and cut off at
+    the limit.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.detail = f"body exceeds {max_bytes} bytes"
+
+    async def __call__(self, scope, receive, send):
+        # GET/HEAD (health probes, /version) carry no body worth guarding:
+        # hand them straight through with no wrapper or header scan.
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > self.max_bytes:
+                    response = ORJSONResponse({"detail": self.detail}, status_code=413)
+                    return await response(scope, receive, send)
+                break
+
+        seen = 0
+
+        async def limited_receive():
+            nonlocal seen
+            message = await receive()
+            if message["type"] == "http.request":
+                seen += len(message.get("body", b""))
+                if seen > self.max_bytes:
+                    # Raised inside the endpoint's body read, so the app's
+                    # HTTPException handler turns it into the 413 response.
+                    raise HTTPException(status_code=413, detail=self.detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(BodyLimitMiddleware, max_bytes=MAX_CODE_BYTES)
+
 # -------------------- Auth helpers --------------------
 def _extract_bearer(auth_header: Optional[str]) -> Optional[str]:
     if not auth_header:
         return None
-    parts = auth_header.split(None, 1)
-    if len(parts) == 2 and parts[0].lower() == "bearer":
-        return parts[1]
+    # Only the 7-char scheme is lowercased; no split() list, no full-header copy.
+    if auth_header[:7].lower() == "bearer ":
+        return auth_header[7:].lstrip()
     return None
 
-def _check_auth(authorization: Optional[str], body_key: Optional[str]):
-    token = _extract_bearer(authorization) or (body_key or "")
+def _check_token(token: Optional[str]):
     if not AUTH_KEY:
         # fail closed if not configured
         raise HTTPException(status_code=500, detail="Server misconfig: AUTH_KEY not set")
-    if token != AUTH_KEY:
+    if not hmac.compare_digest((token or "").encode("utf-8"), _AUTH_KEY_BYTES):
         raise HTTPException(status_code=401, detail="unauthorized")
 
+# Dependencies run before the handler reads the body, so a bad bearer token is
+# refused without buffering or decoding a (possibly 200 KiB) payload.
+async def _header_auth(authorization: Optional[str] = Header(default=None)) -> bool:
+    """True if the bearer token checked out; False if there is none and the body's auth_key decides."""
+    token = _extract_bearer(authorization)
+    if not token:
+        if not AUTH_KEY:
+            _check_token(None)  # 500 before the body is read
+        return False
+    _check_token(token)
+    return True
+
+async def _require_header_auth(authorization: Optional[str] = Header(default=None)) -> None:
+    _check_token(_extract_bearer(authorization))
+
 # -------------------- Utils --------------------
+@lru_cache(maxsize=4)
+def _legacy_pattern(names: Tuple[str, ...]) -> "re.Pattern[str]":
+    # Longest names first so ChLinkEngineRotation is never cut at ChLinkEngine.
+    alts = "|".join(map(re.escape, sorted(names, key=len, reverse=True)))
+    return re.compile(rf"chrono\.({alts})\b")
+
 def _rewrite_legacy_symbols(source: str) -> (str, Dict[str, str]):
     """Conservative text-level replace for exact 'chrono.<Name>' occurrences."""
     replaced: Dict[str, str] = {}
-    out = source
-    for old, new in LEGACY_TO_CURRENT.items():
-        needle = f"chrono.{old}"
-        if needle in out:
-            out = out.replace(needle, f"chrono.{new}")
-            replaced[old] = new
+    if not LEGACY_TO_CURRENT:
+        return source, replaced
+
+    def _sub(m: "re.Match[str]") -> str:
+        old = m.group(1)
+        new = replaced[old] = LEGACY_TO_CURRENT[old]
+        return f"chrono.{new}"
+
+    # One pass over the source for all names; keyed on the current map so
+    # extending LEGACY_TO_CURRENT at runtime recompiles.
+    out = _legacy_pattern(tuple(LEGACY_TO_CURRENT)).sub(_sub, source)
     return out, replaced
 
+# Dedicated threads for parse/validate/compile, sized to the CPU count: they
+# never queue behind (or starve) the threadpool Starlette uses for sync routes.
+_VALIDATOR_POOL = ThreadPoolExecutor(max_workers=VALIDATE_CONCURRENCY, thread_name_prefix="validate")
+
+async def _validate_off_loop(code: str, allow: Optional[Allowlist]):
+    """validate_code is CPU-bound (parse + walk): run it off the event loop."""
+    loop = asyncio.get_running_loop()
+    if allow is None:
+        # Nothing loaded (file missing/broken at startup): let validate_code
+        # hit the file and raise, which the handlers turn into a 500.
+        return await loop.run_in_executor(_VALIDATOR_POOL, validate_code, code, ALLOWLIST_PATH)
+    return await loop.run_in_executor(_VALIDATOR_POOL, validate_code_with, code, allow)
+
+# -------------------- Allowlist --------------------
+# Parsed once at startup into app.state and swapped whole on reload, so the
+# request path never stats, opens or decodes allowlist.json.
+app.state.allowlist = None        # Optional[Allowlist]
+app.state.allowlist_mtime = None  # mtime the loaded allowlist was read at
+
+def _read_allowlist(known_mtime: Optional[float]) -> Optional[Tuple[float, Allowlist]]:
+    """(mtime, Allowlist) when the file changed since known_mtime, else None."""
+    mtime = os.path.getmtime(ALLOWLIST_PATH)
+    if mtime == known_mtime:
+        return None
+    return mtime, load_allowlist(ALLOWLIST_PATH)
+
+async def _refresh_allowlist() -> None:
+    try:
+        loaded = await asyncio.get_running_loop().run_in_executor(
+            _VALIDATOR_POOL, _read_allowlist, app.state.allowlist_mtime
+        )
+    except Exception as e:
+        # Missing, mid-edit or wrong shape (valid JSON that Allowlist cannot
+        # digest): keep serving the last good allowlist, and keep the watcher
+        # alive. Cancellation is a BaseException, so shutdown still stops it.
+        print(f"allowlist reload failed: {type(e).__name__}: {e}", file=sys.stderr)
+        return
+    if loaded is not None:
+        # Assigned here on the loop thread, so handlers always see a matching pair.
+        app.state.allowlist_mtime, app.state.allowlist = loaded
+
+async def _watch_allowlist() -> None:
+    while True:
+        await asyncio.sleep(ALLOWLIST_RELOAD_SEC)
+        await _refresh_allowlist()
+
+_allowlist_watch: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def _load_allowlist():
+    global _allowlist_watch
+    await _refresh_allowlist()
+    if ALLOWLIST_RELOAD_SEC > 0:
+        _allowlist_watch = asyncio.get_running_loop().create_task(_watch_allowlist())
+
+@app.on_event("shutdown")
+async def _stop_allowlist_watch():
+    if _allowlist_watch is not None:
+        _allowlist_watch.cancel()
+
+async def _read_capped(
+    stream: asyncio.StreamReader, cap: int, proc: asyncio.subprocess.Process
+) -> Tuple[bytes, bool]:
+    """
+    Keep at most `cap` bytes. Past that the child is killed rather than
+    drained: nothing it prints afterwards would be returned anyway.
+    """
+    buf = bytearray()
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            return bytes(buf), False
+        room = cap - len(buf)
+        if len(chunk) > room:
+            buf += chunk[:room]
+            _kill_quietly(proc)
+            return bytes(buf), True
+        buf += chunk
+
+def _kill_quietly(proc: asyncio.subprocess.Process) -> None:
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        pass  # already gone
+
+async def _feed_stdin(stdin: asyncio.StreamWriter, data: bytes) -> None:
+    try:
+        stdin.write(data)
+        await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # child exited before reading everything; its returncode tells the story
+    finally:
+        stdin.close()
+
+# -------------------- Execute admission --------------------
+# Bounds concurrent children so a burst cannot fork-bomb the box; overflow is
+# refused quickly (503 + Retry-After) rather than queued behind 15 s jobs.
+_EXEC_SEM = asyncio.Semaphore(EXEC_CONCURRENCY)
+_exec_inflight = 0
+
+async def _admit_exec() -> None:
+    global _exec_inflight
+    try:
+        await asyncio.wait_for(_EXEC_SEM.acquire(), timeout=EXEC_QUEUE_WAIT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="busy", headers={"Retry-After": "1"})
+    _exec_inflight += 1
+
+def _release_exec() -> None:
+    global _exec_inflight
+    _exec_inflight -= 1
+    _EXEC_SEM.release()
+
+# -------------------- Warm worker pool --------------------
+# Idle runner.py processes that already paid interpreter startup + EXEC_PRELOAD
+# and wait for one script on stdin. Each runs a single job and exits, so the
+# pool only trades idle memory for latency, never isolation.
+_idle_workers: Optional[asyncio.Queue] = None
+_bg_tasks: set = set()
+
+async def _spawn_worker() -> asyncio.subprocess.Process:
+    # Absolute executable (no PATH search) and close_fds: with no preexec_fn,
+    # pass_fds or user/group switches, CPython spawns via vfork() instead of
+    # copying this process's page tables. Keep it that way.
+    return await asyncio.create_subprocess_exec(
+        *_RUNNER_ARGV,
+        executable=PYTHON_BIN,
+        env=_RUNNER_ENV,
+        close_fds=True,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=tempfile.gettempdir(),
+    )
+
+async def _refill_pool() -> None:
+    if _idle_workers is not None and not _idle_workers.full():
+        _idle_workers.put_nowait(await _spawn_worker())
+
+def _schedule_refill() -> None:
+    task = asyncio.get_running_loop().create_task(_refill_pool())
+    _bg_tasks.add(task)  # keep a strong ref until done
+    task.add_done_callback(_bg_tasks.discard)
+
+async def _take_worker() -> asyncio.subprocess.Process:
+    while _idle_workers is not None and not _idle_workers.empty():
+        proc = _idle_workers.get_nowait()
+        _schedule_refill()
+        if proc.returncode is None:
+            return proc
+    return await _spawn_worker()  # pool empty or disabled: cold start
+
+@app.on_event("startup")
+async def _start_pool():
+    global _idle_workers
+    if EXEC_POOL_SIZE > 0:
+        _idle_workers = asyncio.Queue(maxsize=EXEC_POOL_SIZE)
+        for _ in range(EXEC_POOL_SIZE):
+            _idle_workers.put_nowait(await _spawn_worker())
+
+@app.on_event("shutdown")
+async def _stop_pool():
+    global _idle_workers
+    pool, _idle_workers = _idle_workers, None
+    while pool is not None and not pool.empty():
+        proc = pool.get_nowait()
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+def _compile_job(code: str) -> bytes:
+    """
+    runner.py job payload: marshal of (source, code object). The code object is
+    compiled from the AST validation already parsed (cached), so the child does
+    no tokenize/parse/compile of its own. Errors only compile() can detect
+    (e.g. 'return' outside function) ship None and let the child report them.
+    """
+    try:
+        co = compile(parse_source(code), SCRIPT_FILENAME, "exec", dont_inherit=True, optimize=0)
+    except (SyntaxError, ValueError):
+        co = None
+    return marshal.dumps((code, co))
+
+async def _run_script(code: str) -> Tuple[int, bytes, bytes, bool]:
+    """
+    Run the script on a warm worker, capturing capped output; raises HTTP 408
+    on timeout. The job goes in over stdin, so nothing touches the disk.
+    """
+    job = await asyncio.get_running_loop().run_in_executor(_VALIDATOR_POOL, _compile_job, code)
+    proc = await _take_worker()
+    try:
+        _, (out, out_trunc), (err, err_trunc), rc = await asyncio.wait_for(
+            asyncio.gather(
+                _feed_stdin(proc.stdin, job),
+                _read_capped(proc.stdout, MAX_STDOUT_BYTES, proc),
+                _read_capped(proc.stderr, MAX_STDERR_BYTES, proc),
+                proc.wait(),
+            ),
+            timeout=EXEC_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise HTTPException(status_code=408, detail=f"execution timeout ({EXEC_TIMEOUT:.0f}s)")
+    return rc, out, err, out_trunc or err_trunc
+
+# -------------------- Streaming execute --------------------
+async def _pump(
+    stream: asyncio.StreamReader, name: str, cap: int,
+    proc: asyncio.subprocess.Process, queue: asyncio.Queue,
+) -> bool:
+    """
+    Forward output chunks to `queue` as (name, text) as soon as they arrive,
+    then (name, None) at EOF. Same cap as _read_capped: past it the child is
+    killed. Returns whether the stream was truncated.
+    """
+    # Incremental: a multi-byte character split across reads stays intact.
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    sent = 0
+    truncated = False
+    while not truncated:
+        chunk = await stream.read(65536)
+        if not chunk:
+            break
+        room = cap - sent
+        if len(chunk) > room:
+            chunk, truncated = chunk[:room], True
+            _kill_quietly(proc)
+        sent += len(chunk)
+        text = decoder.decode(chunk)
+        if text:
+            queue.put_nowait((name, text))
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        queue.put_nowait((name, tail))
+    queue.put_nowait((name, None))
+    return truncated
+
+async def _stream_script(proc: asyncio.subprocess.Process, job: bytes) -> AsyncIterator[bytes]:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + EXEC_TIMEOUT
+    queue: asyncio.Queue = asyncio.Queue()
+    feed = loop.create_task(_feed_stdin(proc.stdin, job))
+    pumps = [
+        loop.create_task(_pump(proc.stdout, "stdout", MAX_STDOUT_BYTES, proc, queue)),
+        loop.create_task(_pump(proc.stderr, "stderr", MAX_STDERR_BYTES, proc, queue)),
+    ]
+    try:
+        open_streams = len(pumps)
+        while open_streams:
+            name, text = await asyncio.wait_for(queue.get(), deadline - loop.time())
+            if text is None:
+                open_streams -= 1
+                continue
+            yield orjson.dumps({"stream": name, "data": text}) + b"\n"
+        rc = await asyncio.wait_for(proc.wait(), deadline - loop.time())
+        truncated = any(p.result() for p in pumps)
+        yield orjson.dumps({"event": "exit", "ok": rc == 0, "returncode": rc, "truncated": truncated}) + b"\n"
+    except asyncio.TimeoutError:
+        _kill_quietly(proc)
+        detail = f"execution timeout ({EXEC_TIMEOUT:.0f}s)"
+        yield orjson.dumps({"event": "timeout", "ok": False, "detail": detail}) + b"\n"
+    finally:
+        # No awaits here: this also runs when the client disconnects and the
+        # stream is cancelled. The event loop's child watcher reaps the process.
+        for task in (feed, *pumps):
+            task.cancel()
+
+class _ExecStream(StreamingResponse):
+    """
+    StreamingResponse whose `cleanup` always runs, even if the client is gone
+    before the body generator ever starts (it would never reach its finally).
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], cleanup: Callable[[], None]):
+        super().__init__(content, media_type="application/x-ndjson")
+        self._cleanup = cleanup
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._cleanup()
+
+# Results keyed by (code digest, loaded allowlist mtime): a hot reload
+# invalidates every entry. Only touched from the event-loop thread (the
+# validation itself runs in a worker), so no lock is needed.
+_VALIDATION_CACHE: "OrderedDict[Tuple[bytes, Optional[float]], List[str]]" = OrderedDict()
+
+def _code_digest(code: str) -> bytes:
+    return hashlib.blake2b(code.encode("utf-8"), digest_size=16).digest()
+
+async def _validate_cached(code: str) -> List[str]:
+    """validate_code with an LRU in front; resent/retried snippets skip the parse."""
+    allow = app.state.allowlist
+    key = (_code_digest(code), app.state.allowlist_mtime)
+    errors = _VALIDATION_CACHE.get(key)
+    if errors is not None:
+        _VALIDATION_CACHE.move_to_end(key)
+        return errors
+    errors = await _validate_off_loop(code, allow)
+    if VALIDATION_CACHE_SIZE > 0:
+        _VALIDATION_CACHE[key] = errors
+        while len(_VALIDATION_CACHE) > VALIDATION_CACHE_SIZE:
+            _VALIDATION_CACHE.popitem(last=False)
+    return errors
+
+# Validation tokens: "<unix ts>.<hmac>" over (code digest, loaded allowlist
+# mtime, ts). Verifying one is a hash, not a parse + walk, and a hot reload of
+# the allowlist invalidates every outstanding token.
+def _sign_validation(digest: bytes, ts: int) -> str:
+    msg = b"%s|%r|%d" % (digest, app.state.allowlist_mtime, ts)
+    return hmac.new(_VALIDATION_TOKEN_KEY, msg, hashlib.sha256).hexdigest()
+
+def _issue_validation_token(code: str) -> str:
+    ts = int(time.time())
+    return f"{ts}.{_sign_validation(_code_digest(code), ts)}"
+
+def _validation_token_ok(token: Optional[str], code: str) -> bool:
+    if not token or REQUIRE_REVALIDATE:
+        return False
+    ts, _, mac = token.partition(".")
+    # isdigit() alone admits "²" and friends, which int() rejects; a malformed
+    # token just means "validate as usual", never a 500.
+    if not (ts.isascii() and ts.isdigit() and len(ts) <= 12):
+        return False
+    issued = int(ts)
+    if not 0 <= time.time() - issued < VALIDATION_TOKEN_TTL:
+        return False
+    # As bytes: compare_digest raises TypeError on non-ASCII str arguments.
+    expected = _sign_validation(_code_digest(code), issued)
+    return hmac.compare_digest(mac.encode("utf-8"), expected.encode("ascii"))
+
 # -------------------- Health & meta --------------------
-@app.get("/")
-def root():
+# Probe endpoints are bare Starlette routes: no FastAPI dependency
+# resolution, no threadpool hop, no response encoding pipeline.
+_HEALTHZ_BODY = orjson.dumps({"ok": True})
+
+async def root(request: Request):
     # Root path helps when Render’s health check is left at default "/"
-    return {"ok": True, "name": "chrono-gate", "ts": time.time()}
+    return ORJSONResponse({"ok": True, "name": "chrono-gate", "ts": time.time()})
 
-@app.get("/health")
-def health():
-    return {"ok": True, "ts": time.time()}
+async def health(request: Request):
+    return ORJSONResponse({"ok": True, "ts": time.time(), "exec_inflight": _exec_inflight})
 
-@app.get("/healthz")
-def healthz():
-    return {"ok": True}
+async def healthz(request: Request):
+    return Response(_HEALTHZ_BODY, media_type="application/json")
+
+app.router.routes[0:0] = [
+    Route("/", root, methods=["GET"]),
+    Route("/health", health, methods=["GET"]),
+    Route("/healthz", healthz, methods=["GET"]),
+]
 
 @app.get("/version")
 def version():
-    return {"ok": True, "version": APP_VERSION, "allowlist_loaded": os.path.exists(ALLOWLIST_PATH)}
+    return {"ok": True, "version": APP_VERSION, "allowlist_loaded": app.state.allowlist is not None}
 
 # -------------------- Core endpoints --------------------
+# Handlers return ORJSONResponse themselves: a returned dict would first be
+# walked by FastAPI's jsonable_encoder, which is pure overhead for these
+# already-JSON-native payloads (and /execute's can be large).
 @app.post("/rewrite")
-def rewrite(req: RewriteReq, authorization: Optional[str] = Header(default=None)):
-    _check_auth(authorization, None)
+async def rewrite(request: Request, _auth: None = Depends(_require_header_auth)):
+    req = await _decode_body(request, RewriteReq)
     try:
         rewritten, replacements = _rewrite_legacy_symbols(req.code)
-        return {"ok": True, "errors": {}, "rewritten": rewritten, "replacements": replacements}
+        return ORJSONResponse({"ok": True, "errors": {}, "rewritten": rewritten, "replacements": replacements})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"rewrite error: {type(e).__name__}: {e}")
 
 @app.post("/validate")
-def validate(req: CodeReq, authorization: Optional[str] = Header(default=None)):
-    _check_auth(authorization, req.auth_key)
+async def validate(request: Request, header_ok: bool = Depends(_header_auth)):
+    req = await _decode_body(request, CodeReq)
+    if not header_ok:
+        _check_token(req.auth_key)
     try:
-        errors = validate_code(req.code, ALLOWLIST_PATH)  # no extra kwargs
-        return {"ok": not bool(errors), "errors": errors}
+        errors = await _validate_cached(req.code)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"validator error: {type(e).__name__}: {e}")
+    if errors or REQUIRE_REVALIDATE:
+        return ORJSONResponse({"ok": not bool(errors), "errors": errors})
+    return ORJSONResponse({"ok": True, "errors": errors, "token": _issue_validation_token(req.code)})
 
-@app.post("/execute")
-def execute(req: CodeReq, authorization: Optional[str] = Header(default=None)):
-    _check_auth(authorization, req.auth_key)
+async def _execute_request(request: Request, header_ok: bool) -> ExecReq:
+    """Decode + auth + validate shared by /execute and /execute_stream."""
+    req = await _decode_body(request, ExecReq)
+    if not header_ok:
+        _check_token(req.auth_key)
+    if _validation_token_ok(req.token, req.code):
+        return req  # this server already validated exactly this code, recently
+    # Otherwise re-validates, but a prior /validate of the same code under the
+    # same loaded allowlist (its mtime is in the cache key) makes this a lookup.
     try:
-        errors = validate_code(req.code, ALLOWLIST_PATH)
+        errors = await _validate_cached(req.code)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"validator error: {type(e).__name__}: {e}")
     if errors:
         raise HTTPException(status_code=422, detail={"errors": errors})
+    return req
 
-    with tempfile.TemporaryDirectory() as d:
-        path = os.path.join(d, "main.py")
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(req.code)
-        try:
-            proc = subprocess.run(
-                [sys.executable, "-u", path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=EXEC_TIMEOUT,
-                check=False,
-                text=True,
-            )
-        except subprocess.TimeoutExpired:
-            raise HTTPException(status_code=408, detail=f"execution timeout ({EXEC_TIMEOUT:.0f}s)")
-
-    return {
-        "ok": proc.returncode == 0,
-        "returncode": proc.returncode,
-        "stdout": proc.stdout,
-        "stderr": proc.stderr,
-    }
+@app.post("/validate_batch")
+async def validate_batch(request: Request, header_ok: bool = Depends(_header_auth)):
+    # One round-trip, auth check and decode for N snippets. The whole body is
+    # still bounded by MAX_CODE_BYTES, so items share that budget.
+    req = await _decode_body(request, BatchReq)
+    if not header_ok:
+        _check_token(req.auth_key)
+    if len(req.items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=422, detail=f"too many items (max {MAX_BATCH_ITEMS})")
+    try:
+        # Concurrency is bounded by the validator pool; repeats hit the cache.
+        all_errors = await asyncio.gather(*(_validate_cached(item.code) for item in req.items))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"validator error: {type(e).__name__}: {e}")
+    results = [{"ok": not errors, "errors": errors} for errors in all_errors]
+    return ORJSONResponse({"ok": all(r["ok"] for r in results), "results": results})
+
+@app.post("/execute")
+async def execute(request: Request, header_ok: bool = Depends(_header_auth)):
+    req = await _execute_request(request, header_ok)
+
+    # Awaiting the child keeps the event loop free instead of parking a
+    # threadpool worker for up to EXEC_TIMEOUT.
+    await _admit_exec()
+    try:
+        returncode, stdout, stderr, truncated = await _run_script(req.code)
+    finally:
+        _release_exec()
+
+    return ORJSONResponse({
+        "ok": returncode == 0,
+        "returncode": returncode,
+        "stdout": stdout.decode("utf-8", "replace"),
+        "stderr": stderr.decode("utf-8", "replace"),
+        "truncated": truncated,
+    })
+
+@app.post("/execute_stream")
+async def execute_stream(request: Request, header_ok: bool = Depends(_header_auth)):
+    # Errors that can still be a status code (401/413/422/503) are raised
+    # before the 200 goes out; from then on everything is an NDJSON event.
+    req = await _execute_request(request, header_ok)
+    await _admit_exec()
+    try:
+        job = await asyncio.get_running_loop().run_in_executor(_VALIDATOR_POOL, _compile_job, req.code)
+        proc = await _take_worker()
+    except BaseException:
+        _release_exec()
+        raise
+
+    def cleanup() -> None:
+        _kill_quietly(proc)  # no-op once it has exited
+        _release_exec()
+
+    return _ExecStream(_stream_script(proc, job), cleanup)